@@ -71,7 +71,7 @@ def _calculate_global_linearity(predict_fn: Callable, input_shape: Tuple, X_samp
     else:
         raise ValueError("Passed 'model_type' not supported. Supported model types: 'classifier', 'regressor'")
     t_f = time() - t_0
-    logger.debug('predict time {}'.format(t_f))
+    logger.debug('predict time: %s', t_f)
 
     if len(outs_shape) == 0:
         sum_out = np.matmul(alphas, outs)
@@ -148,18 +148,15 @@ def _calculate_pairwise_linearity(predict_fn: Callable, x: np.ndarray, input_sha
     else:
         raise ValueError("Passed 'model_type' not supported. Supported model types: 'classifier', 'regressor'")
     t_f = time() - t_0
-    logger.debug('predict time', t_f)
+    logger.debug('predict time: %s', t_f)
 
-    x_out_stack = np.repeat(x_out.reshape((x_out.shape[0], 1,) + (x_out.shape[1:])), outs.shape[1], axis=1)
-
-    # linear superposition of the outputs
-    sum_out = np.matmul(np.array([x_out_stack, outs]).T, alphas).T  # shape=(nb_instances,nb_samples,nb_targets)
+    # linear superposition of the outputs, x_out is broadcast over the samples
+    sum_out = alphas[0] * x_out[:, np.newaxis] + alphas[1] * outs  # shape=(nb_instances,nb_samples,nb_targets)
 
     X_samples = X_samples.reshape(ss + input_shape)
-    x_stack = np.repeat(x.reshape((x.shape[0], 1,) + (x.shape[1:])), X_samples.shape[1], axis=1)
 
-    # linear superposition of the inputs
-    summ = np.matmul(np.array([x_stack, X_samples]).T, alphas).T  # shape=(nb_instances,nb_samples,input_shape)
+    # linear superposition of the inputs, x is broadcast over the samples
+    summ = alphas[0] * x[:, np.newaxis] + alphas[1] * X_samples  # shape=(nb_instances,nb_samples,input_shape)
     if model_type == 'classifier':
         # output of the linear superposition of inputs
         out_sum = np.log(predict_fn(summ.reshape((summ.shape[0] * summ.shape[1],) + summ.shape[2:])) + 1e-10)
@@ -201,27 +198,19 @@ def _sample_knn(x: np.ndarray, X_train: np.ndarray, nb_samples: int = 10) -> np.
 
     """
     x = x.reshape(x.shape[0], -1)
-    nb_instances = x.shape[0]
-    X_sampled = []
-    for i in range(nb_instances):
-        X_train = X_train.reshape(X_train.shape[0], -1)
-        X_stack = np.stack([x[i] for _ in range(X_train.shape[0])], axis=0)
-        X_stack = X_stack.reshape(X_stack.shape[0], -1)
-
-        nbrs = NearestNeighbors(n_neighbors=nb_samples, algorithm='ball_tree').fit(X_train)
-        distances, indices = nbrs.kneighbors(X_stack)
-        distances, indices = distances[0], indices[0]
+    X_train = X_train.reshape(X_train.shape[0], -1)
 
-        X_sampled_tmp = X_train[indices]
-        X_sampled.append(X_sampled_tmp)
+    # fit the tree once and query the nearest neighbours of all instances in a single call
+    nbrs = NearestNeighbors(n_neighbors=nb_samples, algorithm='ball_tree').fit(X_train)
+    _, indices = nbrs.kneighbors(x)  # shape=(nb_instances, nb_samples)
 
-    X_sampled = np.array(X_sampled)  # shape=(nb_instances, nb_samples, nb_features)
+    X_sampled = X_train[indices]  # shape=(nb_instances, nb_samples, nb_features)
 
     return X_sampled
 
 
 def _sample_grid(x: np.ndarray, feature_range: np.ndarray = None, epsilon: float = 0.04,
-                 nb_samples: int = 10, res: int = 100) -> np.ndarray:
+                 nb_samples: int = 10, res: int = 100, rng: np.random.Generator = None) -> np.ndarray:
     """Samples data points uniformly from an interval centered at x and with size epsilon * Delta,
     with delta = f_max - f_min the features ranges.
 
@@ -235,6 +224,10 @@ def _sample_grid(x: np.ndarray, feature_range: np.ndarray = None, epsilon: float
         Size of the sampling region around central instance as percentage of features range.
     nb_samples
         Number of samples to generate.
+    res
+        Resolution of the grid. Number of intervals in which the feature range is discretized.
+    rng
+        Random number generator. If None, a new unseeded generator is created.
 
     Returns
     -------
@@ -251,9 +244,12 @@ def _sample_grid(x: np.ndarray, feature_range: np.ndarray = None, epsilon: float
 
     deltas = (np.abs(feature_range[:, 1] - feature_range[:, 0]) / float(res))  # shape=(nb_features)
 
-    rnd_sign = 2 * (np.random.randint(2, size=(nb_instances, nb_samples, dim))) - 1
-    rnd = np.random.randint(size, size=(nb_instances, nb_samples, dim)) + 1
-    rnd = rnd_sign * rnd  # shape=(nb_instances, nb_samples, nb_features)
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # number of grid steps drawn uniformly from {-size, ..., -1, 1, ..., size} in a single call
+    rnd = rng.integers(2 * size, size=(nb_instances, nb_samples, dim)) - size
+    rnd[rnd >= 0] += 1  # shape=(nb_instances, nb_samples, nb_features)
 
     vprime = rnd * deltas
     X_sampled = x.reshape(x.shape[0], 1, x.shape[1]) + vprime  # shape=(nb_instances, nb_samples, nb_features)
@@ -264,7 +260,8 @@ def _sample_grid(x: np.ndarray, feature_range: np.ndarray = None, epsilon: float
 def _linearity_measure(predict_fn: Callable, x: np.ndarray, X_train: np.ndarray = None,
                        feature_range: Union[List, np.ndarray] = None, method: str = None,
                        epsilon: float = 0.04, nb_samples: int = 10, res: int = 100,
-                       alphas: np.ndarray = None, model_type: str = 'classifier', agg: str = 'global') -> np.ndarray:
+                       alphas: np.ndarray = None, model_type: str = 'classifier', agg: str = 'global',
+                       rng: np.random.Generator = None) -> np.ndarray:
     """Calculate the linearity measure of the model around an instance of interest x.
 
     Parameters
@@ -291,6 +288,8 @@ def _linearity_measure(predict_fn: Callable, x: np.ndarray, X_train: np.ndarray
         Type of task. Supported values are 'regressor' or 'classifier'.
     agg
         Aggregation method. Supported values are 'global' or 'pairwise'.
+    rng
+        Random number generator used by the 'grid' method.
 
     Returns
     -------
@@ -307,7 +306,7 @@ def _linearity_measure(predict_fn: Callable, x: np.ndarray, X_train: np.ndarray
         if isinstance(feature_range, list):
             feature_range = np.asarray(feature_range)
         X_sampled = _sample_grid(x, feature_range=feature_range, epsilon=epsilon,
-                                 nb_samples=nb_samples, res=res)
+                                 nb_samples=nb_samples, res=res, rng=rng)
     else:
         raise ValueError('Method not understood. Supported methods: "knn", "grid"')
     logger.debug(x.shape)
@@ -347,7 +346,7 @@ class LinearityMeasure(object):
 
     def __init__(self, method: str = 'grid', epsilon: float = 0.04, nb_samples: int = 10, res: int = 100,
                  alphas: np.ndarray = None, model_type: str = 'classifier', agg: str = 'pairwise',
-                 verbose: bool = False) -> None:
+                 verbose: bool = False, seed: int = None) -> None:
         """
 
         Parameters
@@ -366,6 +365,8 @@ class LinearityMeasure(object):
             Aggregation method. Supported values are 'global' or 'pairwise'.
         model_type
             Type of task. Supported values are 'regressor' or 'classifier'.
+        seed
+            Seed for the random number generator used by the 'grid' method.
         """
         self.method = method
         self.epsilon = epsilon
@@ -376,6 +377,7 @@ class LinearityMeasure(object):
         self.agg = agg
         self.verbose = verbose
         self.is_fit = False
+        self._rng = np.random.default_rng(seed)
 
     def fit(self, X_train: np.ndarray) -> None:
         """
@@ -422,11 +424,12 @@ class LinearityMeasure(object):
                                      model_type=self.model_type, agg=self.agg)
         elif self.method == 'grid':
             if not self.is_fit:
-                self.feature_range = [[0, 1] for _ in x.shape[1]]  # hardcoded (e.g. from 0 to 1)
+                nb_features = x.reshape(x.shape[0], -1).shape[1]
+                self.feature_range = np.tile([0., 1.], (nb_features, 1))  # hardcoded (e.g. from 0 to 1)
 
             lin = _linearity_measure(predict_fn, x, X_train=None, feature_range=self.feature_range,
                                      method=self.method, nb_samples=self.nb_samples, res=self.res, epsilon=self.epsilon,
-                                     alphas=self.alphas, model_type=self.model_type, agg=self.agg)
+                                     alphas=self.alphas, model_type=self.model_type, agg=self.agg, rng=self._rng)
         else:
             raise ValueError('Method not understood. Supported methods: "knn", "grid"')
 
@@ -436,7 +439,7 @@ class LinearityMeasure(object):
 def linearity_measure(predict_fn: Callable, x: np.ndarray, feature_range: Union[List, np.ndarray] = None,
                       method: str = 'grid', X_train: np.ndarray = None, epsilon: float = 0.04,
                       nb_samples: int = 10, res: int = 100, alphas: np.ndarray = None, agg: str = 'global',
-                      model_type: str = 'classifier') -> np.ndarray:
+                      model_type: str = 'classifier', seed: int = None) -> np.ndarray:
     """Calculate the linearity measure of the model around an instance of interest x.
 
     Parameters
@@ -463,6 +466,8 @@ def linearity_measure(predict_fn: Callable, x: np.ndarray, feature_range: Union[
         Aggregation method. Supported values 'global' or 'pairwise'.
     model_type
         Type of task. Supported values 'regressor' or 'classifier'.
+    seed
+        Seed for the random number generator used by the 'grid' method.
 
     Returns
     -------
@@ -484,7 +489,7 @@ def linearity_measure(predict_fn: Callable, x: np.ndarray, feature_range: Union[
 
         lin = _linearity_measure(predict_fn, x, X_train=None, feature_range=feature_range, method=method,
                                  nb_samples=nb_samples, res=res, epsilon=epsilon, alphas=alphas,
-                                 model_type=model_type, agg=agg)
+                                 model_type=model_type, agg=agg, rng=np.random.default_rng(seed))
     else:
         raise ValueError('Method not understood. Supported methods: "knn", "grid"')
 
@@ -58,6 +58,19 @@ def test_sample_grid(nb_instances, nb_samples, input_shape):
     assert X_samples.shape[1] == nb_samples
 
 
+def test_sample_grid_seed():
+
+    x = np.ones((5, 4))
+    feature_range = np.array([[0, 1] for _ in range(4)])
+
+    X_samples = _sample_grid(x, feature_range, nb_samples=100, rng=np.random.default_rng(0))
+    X_samples_seed = _sample_grid(x, feature_range, nb_samples=100, rng=np.random.default_rng(0))
+    assert (X_samples == X_samples_seed).all()
+
+    steps = np.round((X_samples - x[:, np.newaxis]) * 100).astype(int)  # default res=100, epsilon=0.04
+    assert set(np.unique(steps)) == {-4, -3, -2, -1, 1, 2, 3, 4}
+
+
 @pytest.mark.parametrize('method', ('knn', 'grid'))
 @pytest.mark.parametrize('epsilon', (0.04,))
 @pytest.mark.parametrize('res', (100,))
@@ -211,3 +224,20 @@ def test_LinearityMeasure_reg(method, epsilon, res, nb_instances, agg):
     assert lin_multi.shape[0] == nb_instances, 'Checking shapes'
     assert (lin_multi >= 0).all(), 'Linearity measure must be >= 0'
     assert np.allclose(lin_multi, np.zeros(lin_multi.shape))
+
+
+@pytest.mark.parametrize('input_shape', ((4,), (4, 4, 1)))
+@pytest.mark.parametrize('nb_instances', (1, 10))
+def test_LinearityMeasure_grid_no_fit(input_shape, nb_instances):
+
+    x = np.random.rand(nb_instances, *input_shape)
+
+    def predict_fn(x):
+        x_mean = x.reshape(x.shape[0], -1).mean(axis=1)
+        return np.stack((x_mean, 1 - x_mean), axis=1)
+
+    lm = LinearityMeasure(method='grid', model_type='classifier')
+    lin = lm.score(predict_fn, x)
+    assert lm.feature_range.shape == (x.reshape(nb_instances, -1).shape[1], 2)
+    assert lin.shape[0] == nb_instances, 'Checking shapes'
+    assert (lin >= 0).all(), 'Linearity measure must be >= 0'
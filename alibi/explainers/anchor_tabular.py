@@ -13,6 +13,8 @@ from alibi.utils.wrappers import ArgmaxTransformer
 from alibi.utils.discretizer import Discretizer
 from alibi.utils.distributed import RAY_INSTALLED
 
+logger = logging.getLogger(__name__)
+
 
 class TabularSampler:
     """ A sampler that uses an underlying training set to draw records that have a subset of features with
@@ -328,13 +330,12 @@ class TabularSampler:
 
         for feat, var_type, val in unk_feature_values:
             if var_type == 'c':
-                fmt = "WARNING: No data records have {} feature with value {}. Setting all samples' values to {}!"
-                print(fmt.format(feat, val, val))
+                logger.warning("No data records have %s feature with value %s. Setting all samples' values to %s!",
+                               feat, val, val)
                 samples[:, feat] = val
             else:
-                fmt = "WARNING: For feature {}, no training data record had discretized values in bins {}." \
-                      " Sampling uniformly at random from the feature range!"
-                print(fmt.format(feat, allowed_bins[feat]))
+                logger.warning("For feature %s, no training data record had discretized values in bins %s. "
+                               "Sampling uniformly at random from the feature range!", feat, allowed_bins[feat])
                 min_vals, max_vals = self.min[feat], self.max[feat]
                 samples[:, feat] = np.random.uniform(low=min_vals, high=max_vals, size=(num_samples,))
 
@@ -394,9 +395,7 @@ class TabularSampler:
 
                 # choose replacement values at random from training set
                 feats_to_replace = uniq_feat_ids[:idx]
-                samp_idxs = np.zeros((len(feats_to_replace), n_samp)).astype(int)  # =: P x Q
-                for i, feat_idx in enumerate(feats_to_replace):
-                    samp_idxs[i, :] = np.random.choice(allowed_rows[feat_idx], n_samp, replace=True)
+                samp_idxs = self._sample_rows(allowed_rows, feats_to_replace, n_samp)  # =: P x Q
 
                 # N x F ->  P X Q x F -> P X Q
                 # First slice takes the data rows indicated in rows of samp_idxs; each row corresponds to a diff. feat
@@ -412,13 +411,38 @@ class TabularSampler:
         if max_samples_available <= requested_samples:
             n_samp = samples.shape[0] - start
 
-            samp_idxs = np.zeros((len(uniq_feat_ids), n_samp)).astype(int)
-            for i, feat_idx in enumerate(uniq_feat_ids):
-                samp_idxs[i, :] = np.random.choice(allowed_rows[feat_idx], n_samp, replace=True)
+            samp_idxs = self._sample_rows(allowed_rows, uniq_feat_ids, n_samp)
 
             to_replace_vals = self.train_data[samp_idxs][np.arange(len(uniq_feat_ids)), :, uniq_feat_ids]
             samples[start:, uniq_feat_ids] = to_replace_vals.transpose()
 
+    @staticmethod
+    def _sample_rows(allowed_rows: Dict[int, Any], feat_ids: List[int], n_samp: int) -> np.ndarray:
+        """
+        For each feature, draws (with replacement) training set row indices from the rows where the feature has
+        the same value or is in the same bin as in the instance to be explained. The draws for all the features
+        are done with a single call to the random number generator.
+
+        Parameters
+        ----------
+        allowed_rows
+            See get_feature_index method.
+        feat_ids
+            Original feature ids for which row indices are drawn.
+        n_samp
+            Number of row indices drawn for each feature.
+
+        Returns
+        -------
+            A P x Q array of training set row indices, where P is the number of features and Q is n_samp.
+        """
+
+        rows = [allowed_rows[feat_id] for feat_id in feat_ids]
+        n_rows = np.array([feat_rows.shape[0] for feat_rows in rows])
+        draws = np.random.randint(n_rows[:, np.newaxis], size=(len(rows), n_samp))
+
+        return np.stack([feat_rows[feat_draws] for feat_rows, feat_draws in zip(rows, draws)])
+
     def get_features_index(self, anchor: tuple) -> \
             Tuple[Dict[int, Set[int]], Dict[int, Any], List[Tuple[int, str, Union[Any, int]]]]:
         """
@@ -988,8 +1012,8 @@ class DistributedAnchorTabular(AnchorTabular):
         try:
             ncpu = kwargs['ncpu']
         except KeyError:
-            logging.warning('DistributedAnchorTabular object has been initalised but kwargs did not contain '
-                            'expected argument, ncpu. Defaulting to ncpu=2!')
+            logger.warning('DistributedAnchorTabular object has been initalised but kwargs did not contain '
+                           'expected argument, ncpu. Defaulting to ncpu=2!')
             ncpu = 2
 
         disc = Discretizer(train_data, self.numerical_features, self.feature_names, percentiles=disc_perc)
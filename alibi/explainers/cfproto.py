@@ -128,10 +128,11 @@ class CounterFactualProto(Explainer, FitMixin):
 
         if is_model:  # Keras or TF model
             self.model = True
-            self.classes = self.predict.predict(np.zeros(shape)).shape[1]  # type: ignore
+            self.predict_fn = self.predict.predict  # type: ignore # array function
         else:  # black-box model
             self.model = False
-            self.classes = self.predict(np.zeros(shape)).shape[1]
+            self.predict_fn = self.predict
+        self.classes = self.predict_fn(np.zeros(shape)).shape[1]
 
         if is_enc:
             self.enc_model = True
@@ -692,10 +693,7 @@ class CounterFactualProto(Explainer, FitMixin):
         # update metadata
         self.meta['params'].update(params)
 
-        if self.model:
-            preds = np.argmax(self.predict.predict(train_data), axis=1)  # type: ignore
-        else:
-            preds = np.argmax(self.predict(train_data), axis=1)
+        preds = np.argmax(self.predict_fn(train_data), axis=1)
 
         self.cat_vars_ord = None
         if self.is_cat:  # compute distance metrics for categorical variables
@@ -778,10 +776,14 @@ class CounterFactualProto(Explainer, FitMixin):
             enc_data = self.enc.predict(train_data)
             self.class_proto = {}  # type: dict
             self.class_enc = {}  # type: dict
+            self.class_enc_sq = {}  # type: dict
             for i in range(self.classes):
                 idx = np.where(preds == i)[0]
                 self.class_proto[i] = np.expand_dims(np.mean(enc_data[idx], axis=0), axis=0)
                 self.class_enc[i] = enc_data[idx]
+                # squared L2 norms of the flattened encodings, reused for the k-nearest distances in attack
+                enc_flat = enc_data[idx].reshape(idx.shape[0], int(np.prod(enc_data.shape[1:]))).astype(np.float64)
+                self.class_enc_sq[i] = np.einsum('ij,ij->i', enc_flat, enc_flat)
         elif self.use_kdtree:
             logger.warning('No encoder specified. Using k-d trees to represent class prototypes.')
             if trustscore_kwargs is not None:
@@ -853,7 +855,7 @@ class CounterFactualProto(Explainer, FitMixin):
 
         # N = gradient batch size; F = nb of features; P = nb of prediction classes; B = instance batch size
         # dL/dP -> BxP
-        preds = self.predict(X_pred)  # NxP
+        preds = self.predict_fn(X_pred)  # NxP
         preds_pert_pos, preds_pert_neg = perturb(preds, self.eps[0], proba=True)  # (N*P)xP
 
         def f(preds_pert):
@@ -879,7 +881,7 @@ class CounterFactualProto(Explainer, FitMixin):
             X_pert = num_to_ord(X_pert, self.d_abs)
         if self.ohe:
             X_pert = ord_to_ohe(X_pert, cat_vars_ord)[0]
-        preds_concat = self.predict(X_pert)
+        preds_concat = self.predict_fn(X_pert)
         n_pert = X_pert_pos.shape[0]
         dp_dx = preds_concat[:n_pert] - preds_concat[n_pert:]  # (N*F)*P
         dp_dx = np.reshape(np.reshape(dp_dx, (X.shape[0], -1)),
@@ -1015,14 +1017,23 @@ class CounterFactualProto(Explainer, FitMixin):
             X_enc = self.enc.predict(X)
             class_dict = self.class_proto if k is None else self.class_enc
 
-            for c, v in class_dict.items():
-                if c not in target_class:
-                    continue
-                if k is None:
-                    dist_proto[c] = np.linalg.norm(X_enc - v)
-                elif k is not None:
-                    dist_k = np.linalg.norm(X_enc.reshape(X_enc.shape[0], -1) -
-                                            v.reshape(v.shape[0], -1), axis=1)
+            if k is None:
+                # distances to the prototypes of all target classes in one pass
+                classes = [c for c in class_dict.keys() if c in target_class]
+                protos = np.concatenate([class_dict[c] for c in classes], axis=0)
+                dist_c = np.linalg.norm((X_enc - protos[:, np.newaxis]).reshape(len(classes), -1), axis=1)
+                dist_proto = dict(zip(classes, dist_c))
+            else:
+                # L2 distances to the class encodings from ||v||^2 - 2 * v.x + ||x||^2 with the squared norms
+                # of the encodings precomputed in fit; float64 limits the cancellation error for close encodings
+                X_enc_flat = X_enc.reshape(-1).astype(np.float64)
+                X_enc_sq = X_enc_flat @ X_enc_flat
+                for c, v in class_dict.items():
+                    if c not in target_class:
+                        continue
+                    v_flat = v.reshape(v.shape[0], -1).astype(np.float64)
+                    dist_sq = self.class_enc_sq[c] - 2 * (v_flat @ X_enc_flat) + X_enc_sq
+                    dist_k = np.sqrt(np.maximum(dist_sq, 0))
                     idx = np.argsort(dist_k)[:k]
                     if k_type == 'mean':
                         dist_proto[c] = np.mean(dist_k[idx])
@@ -1138,7 +1149,7 @@ class CounterFactualProto(Explainer, FitMixin):
                         X_der = num_to_ord(X_der, self.d_abs)
                     if self.ohe:
                         X_der = ord_to_ohe(X_der, self.cat_vars_ord)[0]
-                    pred_proba = self.predict(X_der)
+                    pred_proba = self.predict_fn(X_der)
 
                     # compute attack, total and L1+L2 losses as well as new perturbed instance
                     loss_attack = self.loss_fn(pred_proba, Y)
@@ -1305,10 +1316,7 @@ class CounterFactualProto(Explainer, FitMixin):
         data = copy.deepcopy(DEFAULT_DATA_CFP)
 
         if Y is None:
-            if self.model:
-                Y_proba = self.predict.predict(X)  # type: ignore
-            else:
-                Y_proba = self.predict(X)
+            Y_proba = self.predict_fn(X)
             Y_ohe = np.zeros(Y_proba.shape)
             Y_class = np.argmax(Y_proba, axis=1)
             Y_ohe[np.arange(Y_proba.shape[0]), Y_class] = 1
@@ -1338,10 +1346,7 @@ class CounterFactualProto(Explainer, FitMixin):
         data['all'] = self.cf_global
         data['cf'] = {}
         data['cf']['X'] = best_attack
-        if self.model:
-            Y_pert = self.predict.predict(best_attack)  # type: ignore
-        else:
-            Y_pert = self.predict(best_attack)
+        Y_pert = self.predict_fn(best_attack)
         data['cf']['class'] = np.argmax(Y_pert, axis=1)[0]
         data['cf']['proba'] = Y_pert
         data['cf']['grads_graph'], data['cf']['grads_num'] = grads[0], grads[1]
@@ -1,5 +1,6 @@
 import copy
 import numpy as np
+from collections import OrderedDict
 from typing import Callable, Optional, Tuple, Union, TYPE_CHECKING
 import tensorflow.compat.v1 as tf
 import logging
@@ -15,6 +16,28 @@ if TYPE_CHECKING:  # pragma: no cover
 logger = logging.getLogger(__name__)
 
 
+def _other_target_class(probas: np.ndarray, pred_class: int) -> int:
+    """
+    Find the highest probability class different from the class predicted for the instance to be explained.
+
+    Parameters
+    ----------
+    probas
+        Class probabilities of the current counterfactual instance
+    pred_class
+        Predicted class of the instance to be explained
+
+    Returns
+    -------
+        Target class of the explanation.
+
+    """
+    class_idx = np.argsort(-probas)  # class indices in decreasing order of probability
+    if class_idx[0, 0] == pred_class:
+        return class_idx[0, 1]
+    return class_idx[0, 0]
+
+
 def _define_func(predict_fn: Callable,
                  pred_class: int,
                  target_class: Union[str, int] = 'same') -> Tuple[Callable, Union[str, int]]:
@@ -41,17 +64,8 @@ def _define_func(predict_fn: Callable,
 
         def func(X):
             probas = predict_fn(X)
-            sorted = np.argsort(-probas)  # class indices in decreasing order of probability
-
-            # take highest probability class different from class predicted for X
-            if sorted[0, 0] == pred_class:
-                target_class = sorted[0, 1]
-                # logger.debug('Target class equals predicted class')
-            else:
-                target_class = sorted[0, 0]
-
-            # logger.debug('Current best target class: %s', target_class)
-            return (predict_fn(X)[:, target_class]).reshape(-1, 1)
+            target_class = _other_target_class(probas, pred_class)
+            return (probas[:, target_class]).reshape(-1, 1)
 
         return func, target_class
 
@@ -64,6 +78,47 @@ def _define_func(predict_fn: Callable,
     return func, target_class
 
 
+def _define_grad_func(gradient_fn: Callable,
+                      predict_fn: Callable,
+                      pred_class: int,
+                      target_class: Union[str, int] = 'same') -> Callable:
+    """
+    Define the gradients of the class-specific prediction function to be used in the optimization.
+
+    Parameters
+    ----------
+    gradient_fn
+        Function returning the gradients of the class probabilities with respect to the input
+    predict_fn
+        Classifier prediction function
+    pred_class
+        Predicted class of the instance to be explained
+    target_class
+        Target class of the explanation, one of 'same', 'other' or an integer class
+
+    Returns
+    -------
+        Function returning the gradients of the class-specific prediction function with shape
+        Bx1x(shape of X[0]), matching the numerical gradients of the function returned by `_define_func`.
+
+    """
+    if target_class == 'other':
+
+        def grad_func(X):
+            target_class = _other_target_class(predict_fn(X), pred_class)
+            return gradient_fn(X)[:, target_class:target_class + 1]
+
+        return grad_func
+
+    elif target_class == 'same':
+        target_class = pred_class
+
+    def grad_func(X):  # type: ignore
+        return gradient_fn(X)[:, target_class:target_class + 1]
+
+    return grad_func
+
+
 class CounterFactual(Explainer):
 
     def __init__(self,
@@ -84,7 +139,8 @@ class CounterFactual(Explainer):
                  decay: bool = True,
                  write_dir: str = None,
                  debug: bool = False,
-                 sess: tf.Session = None) -> None:
+                 sess: tf.Session = None,
+                 gradient_fn: Callable = None) -> None:
         """
         Initialize counterfactual explanation method based on Wachter et al. (2017)
 
@@ -129,11 +185,15 @@ class CounterFactual(Explainer):
             Flag to write Tensorboard summaries for debugging
         sess
             Optional Tensorflow session that will be used if passed instead of creating or inferring one internally
+        gradient_fn
+            Optional function returning the gradients of the class probabilities with respect to the input, with
+            shape Bx(nb of classes)x(shape of X[0]). Only used for black-box models, in which case it replaces the
+            numerical approximation of the gradients and saves 2 x (nb of features) predictions per step
         """
         super().__init__(meta=copy.deepcopy(DEFAULT_META_CF))
         # get params for storage in meta
         params = locals()
-        remove = ['self', 'predict_fn', 'sess', '__class__']
+        remove = ['self', 'predict_fn', 'sess', 'gradient_fn', '__class__']
         for key in remove:
             params.pop(key)
         self.meta['params'].update(params)
@@ -155,6 +215,7 @@ class CounterFactual(Explainer):
         self.target_proba_arr = target_proba * np.ones(self.batch_size)
 
         self.debug = debug
+        self.gradient_fn = gradient_fn
 
         # check if the passed object is a model and get session
         is_model, is_keras, model_sess = _check_keras_or_tf(predict_fn)
@@ -170,6 +231,9 @@ class CounterFactual(Explainer):
             self.model = True
             self.predict_fn = predict_fn.predict  # type: ignore # array function
             self.predict_tn = predict_fn  # tensor function
+            if gradient_fn is not None:
+                logger.warning('A gradient_fn was passed for a TensorFlow or Keras model. The gradients are taken '
+                               'from the model graph and gradient_fn is ignored.')
 
         else:  # black-box model
             self.predict_fn = predict_fn
@@ -178,6 +242,10 @@ class CounterFactual(Explainer):
 
         self.n_classes = self.predict_fn(np.zeros(shape)).shape[1]
 
+        # predictions on the most recent instances, the same instance is predicted on multiple times per step
+        self._pred_cache = OrderedDict()  # type: OrderedDict
+        self._pred_cache_size = 8
+
         # flag to keep track if explainer is fit or not
         self.fitted = False
 
@@ -259,6 +327,10 @@ class CounterFactual(Explainer):
             grad_and_var = [(self.grad_ph, self.cf)]
             self.apply_grads = opt.apply_gradients(grad_and_var, global_step=self.global_step)
 
+            # read back the updated counterfactual in the same session call that applies the gradients
+            with tf.control_dependencies([self.apply_grads]):
+                self.cf_updated = tf.identity(self.cf)
+
         # variables to initialize
         self.setup = []  # type: list
         self.setup.append(self.orig.assign(self.assign_orig))
@@ -288,6 +360,22 @@ class CounterFactual(Explainer):
 
         return X_init
 
+    def _cached_predict(self, X: np.ndarray) -> np.ndarray:
+        # only cache predictions on a batch of instances, not on the numerical gradient perturbations
+        if X.shape != self.data_shape:
+            return self.predict_fn(X)
+
+        key = (X.dtype.str, X.tobytes())
+        if key in self._pred_cache:
+            self._pred_cache.move_to_end(key)
+            return self._pred_cache[key]
+
+        preds = self.predict_fn(X)
+        self._pred_cache[key] = preds
+        if len(self._pred_cache) > self._pred_cache_size:
+            self._pred_cache.popitem(last=False)
+        return preds
+
     def fit(self,
             X: np.ndarray,
             y: Optional[np.ndarray]) -> "CounterFactual":
@@ -321,7 +409,7 @@ class CounterFactual(Explainer):
                            'but first dim = %s', X.shape[0])
 
         # make a prediction
-        Y = self.predict_fn(X)
+        Y = self._cached_predict(X)
 
         pred_class = Y.argmax(axis=1).item()
         pred_prob = Y.max(axis=1).item()
@@ -331,13 +419,19 @@ class CounterFactual(Explainer):
         logger.debug('Initial prediction: %s with p=%s', pred_class, pred_prob)
 
         # define the class-specific prediction function
-        self.predict_class_fn, t_class = _define_func(self.predict_fn, pred_class, self.target_class)
+        self.predict_class_fn, t_class = _define_func(self._cached_predict, pred_class, self.target_class)
+        if self.gradient_fn is not None:
+            self.predict_class_grad_fn = _define_grad_func(self.gradient_fn, self._cached_predict, pred_class,
+                                                           self.target_class)
 
         # initialize with an instance
         X_init = self._initialize(X)
 
         # minimize loss iteratively
-        self._minimize_loss(X, X_init, Y)
+        try:
+            self._minimize_loss(X, X_init, Y)
+        finally:
+            self._pred_cache.clear()
 
         return_dict = self.return_dict.copy()
         self.instance_dict = dict.fromkeys(['X', 'distance', 'lambda', 'index', 'class', 'proba', 'loss'])
@@ -362,7 +456,7 @@ class CounterFactual(Explainer):
         self.instance_dict['lambda'] = lam[0]
         self.instance_dict['index'] = l_step * self.max_iter + i
 
-        preds = self.predict_fn(X_current)
+        preds = self._cached_predict(X_current)
         pred_class = preds.argmax()
         proba = preds.max()
         self.instance_dict['class'] = pred_class
@@ -423,29 +517,20 @@ class CounterFactual(Explainer):
         self.writer.flush()
 
     def _bisect_lambda(self, cf_found, l_step, lam, lam_lb, lam_ub):
+        # bounds and lambda are updated in place for the whole batch at once
+        # minimum number of CF instances to warrant increasing lambda TODO: hyperparameter?
+        enough_cf = cf_found[:, l_step] >= 5
 
-        for batch_idx in range(self.batch_size):  # TODO: batch not supported
-            if cf_found[batch_idx][l_step] >= 5:  # minimum number of CF instances to warrant increasing lambda
-                # want to improve the solution by putting more weight on the distance term TODO: hyperparameter?
-                # by increasing lambda
-                lam_lb[batch_idx] = max(lam[batch_idx], lam_lb[batch_idx])
-                logger.debug('Lambda bounds: (%s, %s)', lam_lb[batch_idx], lam_ub[batch_idx])
-                if lam_ub[batch_idx] < 1e9:
-                    lam[batch_idx] = (lam_lb[batch_idx] + lam_ub[batch_idx]) / 2
-                else:
-                    lam[batch_idx] *= 10
-                    logger.debug('Changed lambda to %s', lam[batch_idx])
-
-            elif cf_found[batch_idx][l_step] < 5:
-                # if not enough solutions found so far, decrease lambda by a factor of 10,
-                # otherwise bisect up to the last known successful lambda
-                lam_ub[batch_idx] = min(lam_ub[batch_idx], lam[batch_idx])
-                logger.debug('Lambda bounds: (%s, %s)', lam_lb[batch_idx], lam_ub[batch_idx])
-                if lam_lb[batch_idx] > 0:
-                    lam[batch_idx] = (lam_lb[batch_idx] + lam_ub[batch_idx]) / 2
-                    logger.debug('Changed lambda to %s', lam[batch_idx])
-                else:
-                    lam[batch_idx] /= 10
+        # if enough solutions are found, improve the solution by putting more weight on the distance term
+        # by increasing lambda; otherwise decrease lambda by a factor of 10 or bisect up to the last
+        # known successful lambda
+        lam_lb[enough_cf] = np.maximum(lam[enough_cf], lam_lb[enough_cf])
+        lam_ub[~enough_cf] = np.minimum(lam_ub[~enough_cf], lam[~enough_cf])
+        logger.debug('Lambda bounds: (%s, %s)', lam_lb, lam_ub)
+
+        bisect = np.where(enough_cf, lam_ub < 1e9, lam_lb > 0)
+        lam[:] = np.where(bisect, (lam_lb + lam_ub) / 2, np.where(enough_cf, lam * 10, lam / 10))
+        logger.debug('Changed lambda to %s', lam)
 
         return lam, lam_lb, lam_ub
 
@@ -472,6 +557,10 @@ class CounterFactual(Explainer):
         cf_count = np.zeros_like(lams)
         logger.debug('Initial lambda sweep: %s', lams)
 
+        # prediction loss gradients stay zero for TF/keras models, so the buffer is only allocated once;
+        # float32 matches the gradient placeholder so no float64 arrays are built and fed each step
+        grads_num = np.zeros(self.data_shape, dtype=np.float32)
+
         X_current = X_init
         # TODO this whole initial loop should be optional?
         for ix, l_step in enumerate(lams):
@@ -483,17 +572,20 @@ class CounterFactual(Explainer):
 
             for i in range(n_steps):
 
-                # numerical gradients
-                grads_num = np.zeros(self.data_shape)
+                # numerical or user-supplied gradients of the prediction loss
                 if not self.model:
                     pred = self.predict_class_fn(X_current)
-                    prediction_grad = num_grad_batch(self.predict_class_fn, X_current, eps=self.eps)
+                    if self.gradient_fn is None:
+                        prediction_grad = num_grad_batch(self.predict_class_fn, X_current, eps=self.eps)
+                    else:
+                        prediction_grad = self.predict_class_grad_fn(X_current)
 
                     # squared difference prediction loss
-                    loss_pred = (pred - self.target_proba.eval(session=self.sess)) ** 2
-                    grads_num = 2 * (pred - self.target_proba.eval(session=self.sess)) * prediction_grad
+                    pred_diff = pred - self.target_proba_arr
+                    loss_pred = pred_diff ** 2
+                    grads_num = 2 * pred_diff * prediction_grad
 
-                    grads_num = grads_num.reshape(self.data_shape)  # TODO? correct?
+                    grads_num = grads_num.reshape(self.data_shape).astype(np.float32)  # TODO? correct?
 
                 # add values to tensorboard (1st item in batch only) every n steps
                 if self.debug and not i % 50:
@@ -508,10 +600,9 @@ class CounterFactual(Explainer):
 
                 # apply gradients
                 gradients = grads_graph + grads_num
-                self.sess.run(self.apply_grads, feed_dict={self.grad_ph: gradients, self.lam: lam})
+                X_current = self.sess.run(self.cf_updated, feed_dict={self.grad_ph: gradients, self.lam: lam})
 
                 # does the counterfactual condition hold?
-                X_current = self.sess.run(self.cf)
                 cond = self._prob_condition(X_current).squeeze()
                 if cond:
                     cf_count[ix] += 1
@@ -554,17 +645,20 @@ class CounterFactual(Explainer):
             # number of gradient descent steps in each inner loop
             for i in range(self.max_iter):
 
-                # numerical gradients
-                grads_num = np.zeros(self.data_shape)
+                # numerical or user-supplied gradients of the prediction loss
                 if not self.model:
                     pred = self.predict_class_fn(X_current)
-                    prediction_grad = num_grad_batch(self.predict_class_fn, X_current, eps=self.eps)
+                    if self.gradient_fn is None:
+                        prediction_grad = num_grad_batch(self.predict_class_fn, X_current, eps=self.eps)
+                    else:
+                        prediction_grad = self.predict_class_grad_fn(X_current)
 
                     # squared difference prediction loss
-                    loss_pred = (pred - self.target_proba.eval(session=self.sess)) ** 2
-                    grads_num = 2 * (pred - self.target_proba.eval(session=self.sess)) * prediction_grad
+                    pred_diff = pred - self.target_proba_arr
+                    loss_pred = pred_diff ** 2
+                    grads_num = 2 * pred_diff * prediction_grad
 
-                    grads_num = grads_num.reshape(self.data_shape)
+                    grads_num = grads_num.reshape(self.data_shape).astype(np.float32)
 
                 # add values to tensorboard (1st item in batch only) every n steps
                 if self.debug and not i % 50:
@@ -580,10 +674,9 @@ class CounterFactual(Explainer):
 
                 # apply gradients
                 gradients = grads_graph + grads_num
-                self.sess.run(self.apply_grads, feed_dict={self.grad_ph: gradients, self.lam: lam})
+                X_current = self.sess.run(self.cf_updated, feed_dict={self.grad_ph: gradients, self.lam: lam})
 
                 # does the counterfactual condition hold?
-                X_current = self.sess.run(self.cf)
                 cond = self._prob_condition(X_current)
                 if cond:
                     self._update_exp(i, l_step, lam, cf_found, X_current)
@@ -10,6 +10,7 @@ from copy import deepcopy
 
 from alibi.api.defaults import DEFAULT_META_ANCHOR, DEFAULT_DATA_ANCHOR
 from alibi.explainers import DistributedAnchorTabular
+from alibi.explainers.anchor_tabular import TabularSampler
 from alibi.explainers.tests.utils import predict_fcn
 from alibi.utils.distributed import RAY_INSTALLED
 
@@ -293,3 +294,23 @@ def test_sampler(test_instance_idx, anchors, nb_samples, dataset, rf_classifier,
         # check features sampled are in a sensible range for numerical features
         assert (train_data_mean + train_data_3std - raw_data_mean > 0).all()
         assert (train_data_mean - train_data_3std - raw_data_mean < 0).all()
+
+
+@pytest.mark.parametrize('n_samp', [1, 100], ids='n_samp={}'.format)
+def test_sample_rows(n_samp):
+    """
+    Test that the row indices drawn for each feature are only taken from the rows allowed for that feature.
+    """
+
+    allowed_rows = {
+        0: np.array([3, 7, 9]),
+        2: np.arange(50, 100),
+        5: np.array([11]),
+    }
+    feat_ids = [5, 0, 2]
+
+    samp_idxs = TabularSampler._sample_rows(allowed_rows, feat_ids, n_samp)
+
+    assert samp_idxs.shape == (len(feat_ids), n_samp)
+    for feat_id, feat_idxs in zip(feat_ids, samp_idxs):
+        assert set(feat_idxs) <= set(allowed_rows[feat_id])
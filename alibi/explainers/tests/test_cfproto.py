@@ -85,6 +85,29 @@ def test_tf_keras_iris_explainer(disable_tf2, iris_data, tf_keras_iris_explainer
     assert grads.shape == x.shape
 
 
+@pytest.mark.tf1
+def test_fit_empty_class(disable_tf2, iris_data):
+    X_train = iris_data['X_train']
+    shape = (1, 4)
+
+    # classifier which never predicts the last class and random encoder
+    model = tf.keras.Sequential([tf.keras.layers.Dense(3, activation='softmax', input_shape=shape[1:])])
+    w, b = model.get_weights()
+    model.set_weights([w, b + np.array([0., 0., -1e3], dtype=b.dtype)])
+    enc = tf.keras.Sequential([tf.keras.layers.Dense(2, input_shape=shape[1:])])
+
+    cf = CounterFactualProto(model, shape, theta=100, enc_model=enc, max_iterations=100, c_steps=1,
+                             feature_range=(X_train.min(axis=0).reshape(shape), X_train.max(axis=0).reshape(shape)))
+    cf.fit(X_train)
+    keras.backend.clear_session()
+    tf.keras.backend.clear_session()
+
+    assert cf.class_enc[2].shape == (0, 2)
+    assert cf.class_enc_sq[2].shape == (0,)
+    for c in range(2):
+        assert np.allclose(cf.class_enc_sq[c], np.sum(cf.class_enc[c].astype(np.float64) ** 2, axis=1))
+
+
 @pytest.fixture
 def tf_keras_adult_explainer(request, models, adult_data):
     shape = (1, 57)
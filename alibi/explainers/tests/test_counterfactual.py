@@ -7,7 +7,7 @@ import tensorflow as tf
 import keras
 
 from alibi.api.defaults import DEFAULT_META_CF, DEFAULT_DATA_CF
-from alibi.explainers.counterfactual import _define_func
+from alibi.explainers.counterfactual import _define_func, _define_grad_func
 from alibi.explainers import CounterFactual
 
 
@@ -66,6 +66,33 @@ def test_define_func(logistic_iris, target_class):
         assert func(x) == probas[:, ix2]
 
 
+@pytest.mark.parametrize('target_class', ['other', 'same', 0, 1, 2])
+def test_define_grad_func(logistic_iris, target_class):
+    X, y, model = logistic_iris
+
+    x = X[0].reshape(1, -1)
+    predict_fn = model.predict_proba
+    probas = predict_fn(x)
+    pred_class = probas.argmax(axis=1)[0]
+
+    def gradient_fn(X):
+        # gradients equal to the class index for each feature
+        return np.tile(np.arange(probas.shape[1]).reshape(1, -1, 1), (X.shape[0], 1, X.shape[1]))
+
+    grad_func = _define_grad_func(gradient_fn, predict_fn, pred_class, target_class)
+    grads = grad_func(x)
+    assert grads.shape == (1, 1) + x.shape[1:]
+
+    if target_class == 'same':
+        assert (grads == pred_class).all()
+    elif isinstance(target_class, int):
+        assert (grads == target_class).all()
+    elif target_class == 'other':
+        # highest probability different to the class of x
+        ix2 = np.argsort(-probas)[:, 1]
+        assert (grads == ix2).all()
+
+
 @pytest.mark.tf1
 @pytest.mark.parametrize('cf_iris_explainer',
                          ['other', 'same', 0, 1, 2],
@@ -108,6 +135,71 @@ def test_cf_explainer_iris(disable_tf2, cf_iris_explainer):
         assert np.abs(pred_class_fn(x_cf) - target_proba) <= tol
 
 
+@pytest.mark.tf1
+def test_cf_explainer_iris_pred_cache(disable_tf2, logistic_iris):
+    X, y, lr = logistic_iris
+    x = X[0].reshape(1, -1)
+    n_calls = {'cached': 0, 'uncached': 0}
+
+    def predict_fn_counter(key):
+        def predict_fn(X):
+            n_calls[key] += 1
+            return lr.predict_proba(X)
+        return predict_fn
+
+    cfs, exps = {}, {}
+    for key in n_calls.keys():
+        cf = CounterFactual(predict_fn=predict_fn_counter(key), shape=(1, 4), target_class='other', lam_init=1e-1,
+                            max_iter=1000, max_lam_steps=10)
+        if key == 'uncached':
+            cf._cached_predict = cf.predict_fn  # bypass the cache
+        cfs[key], exps[key] = cf, cf.explain(x)
+        keras.backend.clear_session()
+        tf.keras.backend.clear_session()
+
+    # the cache is emptied after explain and the counterfactual does not depend on it
+    cf = cfs['cached']
+    assert not cf._pred_cache
+    assert np.allclose(exps['cached'].cf['X'], exps['uncached'].cf['X'])
+    assert n_calls['cached'] < n_calls['uncached']
+
+    # a second prediction on an instance with the same bytes is served from the cache
+    n_calls['cached'] = 0
+    cf.predict_fn = predict_fn_counter('cached')
+    preds = cf._cached_predict(x)
+    preds_cached = cf._cached_predict(x.copy())
+    assert n_calls['cached'] == 1
+    assert preds_cached is preds
+
+
+@pytest.mark.tf1
+@pytest.mark.parametrize('target_class', ['other', 0], ids='target={}'.format)
+def test_cf_explainer_iris_gradient_fn(disable_tf2, logistic_iris, target_class):
+    X, y, lr = logistic_iris
+    x = X[0].reshape(1, -1)
+    predict_fn = lr.predict_proba
+    pred_class = predict_fn(x).argmax()
+
+    def gradient_fn(X):
+        # analytic gradients of the softmax probabilities: dp_k/dx = p_k * (w_k - sum_j p_j * w_j)
+        probas = predict_fn(X)
+        w_mean = probas @ lr.coef_
+        return probas[:, :, np.newaxis] * (lr.coef_[np.newaxis] - w_mean[:, np.newaxis])
+
+    cf = CounterFactual(predict_fn=predict_fn, shape=(1, 4), target_class=target_class, lam_init=1e-1,
+                        max_iter=1000, max_lam_steps=10, gradient_fn=gradient_fn)
+    exp = cf.explain(x)
+    keras.backend.clear_session()
+    tf.keras.backend.clear_session()
+
+    assert exp.success
+    pred_class_cf = predict_fn(exp.cf['X']).argmax()
+    if target_class == 'other':
+        assert pred_class_cf != pred_class
+    else:
+        assert pred_class_cf == target_class
+
+
 @pytest.mark.tf1
 @pytest.mark.parametrize('keras_mnist_cf_explainer',
                          ['other', 'same', 4, 9],
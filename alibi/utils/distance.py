@@ -31,6 +31,52 @@ def cityblock_batch(X: np.ndarray,
     return np.abs(X - y).sum(axis=tuple(np.arange(1, X_dim))).reshape(X.shape[0], -1)
 
 
+def _cat_counts(x: np.ndarray, n_cat: int) -> np.ndarray:
+    """
+    Count the occurrences of each category in an integer encoded variable.
+
+    Parameters
+    ----------
+    x
+        Array with the integer encoded categories.
+    n_cat
+        Number of categories. Values which are not integers in [0, n_cat) are ignored.
+
+    Returns
+    -------
+    Array of shape (n_cat,) with the number of occurrences of each category.
+    """
+    x = x.ravel()
+    x_int = x.astype(int)
+    return np.bincount(x_int[(x_int == x) & (x_int >= 0) & (x_int < n_cat)], minlength=n_cat)
+
+
+def _contingency_table(x: np.ndarray, y: np.ndarray, n_x: int, n_y: int) -> np.ndarray:
+    """
+    Count the co-occurrences of the categories of two integer encoded variables.
+
+    Parameters
+    ----------
+    x
+        Array with the integer encoded categories of the first variable.
+    y
+        Array with the integer encoded categories of the second variable.
+    n_x
+        Number of categories of the first variable.
+    n_y
+        Number of categories of the second variable.
+
+    Returns
+    -------
+    Array of shape (n_x, n_y) where element (i, j) counts the instances with x == i and y == j.
+    Values which are not integers in [0, n_x) or [0, n_y) are ignored.
+    """
+    x, y = x.ravel(), y.ravel()
+    x_int, y_int = x.astype(int), y.astype(int)
+    mask = (x_int == x) & (x_int >= 0) & (x_int < n_x) & (y_int == y) & (y_int >= 0) & (y_int < n_y)
+    return np.bincount(x_int[mask] * n_y + y_int[mask], minlength=n_x * n_y).reshape(n_x, n_y)
+
+
 def mvdm(X: np.ndarray,
          y: np.ndarray,
          cat_vars: dict,
@@ -68,20 +114,9 @@ def mvdm(X: np.ndarray,
     # conditional probabilities and pairwise distance matrix
     d_pair = {}
     for col, n_cat in cat_vars.items():
-        d_pair_col = np.zeros([n_cat, n_cat])
-        p_cond_col = np.zeros([n_cat, n_y])
-        for i in range(n_cat):
-            idx = np.where(X[:, col] == i)[0]
-            for i_y in range(n_y):
-                p_cond_col[i, i_y] = np.sum(y[idx] == i_y) / (y[idx].shape[0] + 1e-12)
-
-        for i in range(n_cat):
-            j = 0
-            while j < i:  # symmetrical matrix
-                d_pair_col[i, j] = np.sum(np.abs(p_cond_col[i, :] - p_cond_col[j, :]) ** alpha)
-                j += 1
-        d_pair_col += d_pair_col.T
-        d_pair[col] = d_pair_col
+        n_col = _cat_counts(X[:, col], n_cat)
+        p_cond_col = _contingency_table(X[:, col], y, n_cat, n_y) / (n_col[:, np.newaxis] + 1e-12)
+        d_pair[col] = np.sum(np.abs(p_cond_col[:, np.newaxis, :] - p_cond_col[np.newaxis, :, :]) ** alpha, axis=-1)
     return d_pair
 
 
@@ -123,40 +158,23 @@ def abdm(X: np.ndarray,
     cat_vars_combined = {**cat_vars, **cat_vars_bin}
 
     d_pair = {}  # type: Dict
-    X_cat_eq = {}  # type: Dict
     for col, n_cat in cat_vars.items():
-        X_cat_eq[col] = []
-        for i in range(n_cat):  # for each category in categorical variable, store instances of each category
-            idx = np.where(X[:, col] == i)[0]
-            X_cat_eq[col].append(X[idx, :])
+        n_col = _cat_counts(X[:, col], n_cat)
 
         # conditional probabilities, also use the binned numerical features
         p_cond = []
         for col_t, n_cat_t in cat_vars_combined.items():
             if col == col_t:
                 continue
-            p_cond_t = np.zeros([n_cat_t, n_cat])
-            for i in range(n_cat_t):
-                for j, X_cat_j in enumerate(X_cat_eq[col]):
-                    idx = np.where(X_cat_j[:, col_t] == i)[0]
-                    p_cond_t[i, j] = len(idx) / (X_cat_j.shape[0] + eps)
-            p_cond.append(p_cond_t)
-
-        # pairwise distance matrix
-        d_pair_col = np.zeros([n_cat, n_cat])
-        for i in range(n_cat):
-            j = 0
-            while j < i:
-                d_ij_tmp = 0
-                for p in p_cond:  # loop over other categorical variables
-                    for t in range(p.shape[0]):  # loop over categories of each categorical variable
-                        a, b = p[t, i], p[t, j]
-                        d_ij_t = a * np.log((a + eps) / (b + eps)) + b * np.log((b + eps) / (a + eps))  # KL divergence
-                        d_ij_tmp += d_ij_t
-                d_pair_col[i, j] = d_ij_tmp
-                j += 1
-        d_pair_col += d_pair_col.T
-        d_pair[col] = d_pair_col
+            p_cond.append(_contingency_table(X[:, col_t], X[:, col], n_cat_t, n_cat) / (n_col + eps))
+
+        # pairwise distance matrix: symmetric KL divergence summed over the categories of the other variables
+        if not p_cond:
+            d_pair[col] = np.zeros([n_cat, n_cat])
+            continue
+        p = np.concatenate(p_cond, axis=0)
+        a, b = p[:, :, np.newaxis], p[:, np.newaxis, :]
+        d_pair[col] = np.sum(a * np.log((a + eps) / (b + eps)) + b * np.log((b + eps) / (a + eps)), axis=0)
     return d_pair
 
 
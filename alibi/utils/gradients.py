@@ -74,7 +74,7 @@ def num_grad_batch(func: Callable,
     grad_numerator = np.reshape(np.reshape(grad_numerator, (batch_size, -1)),
                                 (batch_size, preds.shape[1], -1), order='F')  # NxPxF
 
-    grad = grad_numerator / (2 * eps)  # NxPxF
+    grad = grad_numerator * (.5 / eps)  # NxPxF, multiply by the reciprocal of the step size
     grad = grad.reshape(preds.shape + data_shape)  # BxPx(shape of X[0])
 
     return grad
@@ -28,7 +28,7 @@ setup(name='alibi',
       python_requires='>=3.6',
       # lower bounds based on Debian Stable versions where available
       install_requires=[
-          'numpy>=1.16.2, <2.0.0',
+          'numpy>=1.17.0, <2.0.0',
           'pandas>=0.23.3, <2.0.0',
           'scikit-learn>=0.20.2, <0.25.0',
           'spacy[lookups]>=2.0.0, <4.0.0',